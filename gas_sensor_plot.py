@@ -5,15 +5,85 @@
 # will be integrated into both units. The current script on the raspberry pi is smarter and should
 # recognize what sensors are connected and what are not.
 
-import time, os
+import time, os, re
 import numpy as np
+import matplotlib
+
+# plots are only ever saved to disk from the crontab, so use the non-interactive backend
+matplotlib.use('Agg')
+
 import matplotlib.pyplot as plt
-import matplotlib.ticker as ticker
+import matplotlib.dates as mdates
 import pandas as pd
 import argparse
 import logging
 
+from collections import defaultdict
 from datetime import date, datetime, timedelta
+from pathlib import Path
+
+# resolution of the saved plots, they're only used for diagnostics so they don't need to be print quality
+DPI = int(os.environ.get('GASBOX_DPI', '120'))
+
+# figure reused by every call to plot_data in a process, it's cleared instead of rebuilt each time
+_FIG = None
+
+# format of the dates passed to the script and used for the day directories, and the one used in the csv file names
+DATE_FORMAT = '%m-%d-%Y'
+FILE_DATE_FORMAT = '%m%d%Y'
+
+# substrings of the column names that decide which subplot a column is drawn on
+PLOT_CATEGORIES = ['PM', 'Temp', 'RH', 'Current', 'Voltage', 'Power', 'Pressure', 'Gas', 'CO2']
+
+# matches the first category substring in a column name
+CATEGORY_RE = re.compile('({})'.format('|'.join(PLOT_CATEGORIES)))
+
+# categories that share a subplot (on a twin y axis) with another category
+SHARED_AXES = {'RH': 'Temp', 'CO2': 'Gas'}
+
+# y axis label and limits for each category, a limit of None is left to matplotlib
+AXIS_CONFIG = {
+    'PM': ('PM Conc (ug/m3)', None),
+    'Temp': ('Temp (C)', (-20, 80)),
+    'RH': ('RH (%)', (0, 100)),
+    'Current': ('Current (mA)', (0, 500)),
+    'Voltage': ('Voltage (V)', (0, 16)),
+    'Power': ('Power (W)', (0, 15)),
+    'Pressure': ('Pressure (hPa)', (0, 1000)),
+    'Gas': ('BME Gas (ohms)', (0, None)),
+    'CO2': ('CO2 CONC (PPM)', (0, None)),
+}
+
+# line colors for categories that share a subplot, so the lines on the two y axes can be told apart
+AXIS_COLORS = {
+    'Temp': ['r', '#F97306', 'm', '#FFFF14'],
+    'RH': ['b', 'g', 'c'],
+    'Gas': ['r'],
+    'CO2': ['b'],
+}
+
+
+def parse_times(times):
+    '''
+    Parse the Time strings from the csv. Times with a UTC offset are converted to UTC, so times from either
+    side of a daylight savings change (or without an offset at all) can be sorted and compared together.
+
+    input param: times, Time strings from the csv
+    input type: pandas series
+
+    output param: parsed, the parsed times, timezone aware in UTC, NaT for any that can't be parsed
+    output type: pandas series
+    '''
+
+    try:
+        return pd.to_datetime(times, utc=True)
+    except (ValueError, TypeError):
+        # e.g. a line written in a different format, parse each time on its own and leave out what can't be
+        parsed = pd.to_datetime(times, utc=True, format='mixed', errors='coerce')
+        bad = times[parsed.isna() & times.notna()]
+        logging.warning('Times not all in one format, {} could not be parsed and are left off the plot: {}'.format(len(bad), list(bad[:5])))
+
+        return parsed
 
 
 def reader(file_path):
@@ -21,13 +91,33 @@ def reader(file_path):
     Reads CSV as a pandas datafreame and returns it for plotting
 
     input param: file_path, the file containing the 10 minute averages of diagnostic data for one day. 
-    input type: string
+    input type: pathlib Path
     
-    output param: df, pandas dataframe containing the data from file.
+    output param: df, pandas dataframe containing the data from file, sorted by Time. Time is kept as the 
+    csv's own strings so the text file matches the csv, the parsed times are the index.
     output type: pandas, dataframe
     '''
 
-    df = pd.read_csv(file_path, header=0)
+    # everything but Time is a sensor reading, so read those straight in as floats instead of letting
+    # pandas sniff every column. float64 is needed to keep 2 decimals on the large BME gas readings
+    # this can be hard coded since we will alwasy have a Time frame and it will always be called Time
+    try:
+        df = pd.read_csv(file_path, header=0, dtype=defaultdict(lambda: 'float64', Time=str), engine='c', low_memory=False)
+    except ValueError as e:
+        # a column has something other than numbers in it, fall back to letting pandas work out the types
+        df = pd.read_csv(file_path, header=0, dtype={'Time': str})
+        text_cols = [val for val in df.columns if val != 'Time' and not pd.api.types.is_numeric_dtype(df[val])]
+        logging.warning('Falling back to inferred column types, not numeric: {} ({})'.format(text_cols, e))
+
+        # these are left out of the plot, which for a Current or Power column means out of the totals too
+        for val in text_cols:
+            if classify(val) in ('Current', 'Power'):
+                logging.warning('{} is not numeric and is left out of the {} total'.format(val, classify(val)))
+
+    # parse the times once, the plot uses them from the index. Make sure the rows are in ascending order 
+    # according to Time, keeping the csv's order for repeated times so the text file can be appended to
+    df.index = pd.DatetimeIndex(parse_times(df['Time']))
+    df.sort_index(kind='stable', inplace=True)
     
     return df
 
@@ -37,7 +127,7 @@ def get_file(date, plat):
     Returns the name of the CSV file of 10-minute averages.    
 
     input param: date, the date of data we want to plot
-    input type: string
+    input type: datetime date
         
     input param: plat, the platform where the data we want to plot are from
     input type: string
@@ -46,22 +136,25 @@ def get_file(date, plat):
     output type: string
     '''
     
-    return plat + date[0:2] + date[3:5] + date [6:10] + '.csv' 
+    return '{}{}.csv'.format(plat, date.strftime(FILE_DATE_FORMAT))
   
 
 def get_date(arg):
     '''
     Return the date of the file that we're plotting/making the text file for. If no argument is given, then the 
-    date we want is the current day. If an argument is given, then we simply return the argument.
+    date we want is the current day. If an argument is given, then we parse it once here and pass the date along.
 
-    input param: arg, the date that is passed as an argument to the script running in the crontab
+    input param: arg, the date that is passed as an argument to the script running in the crontab, e.g. 08-05-2021
     input type: string
+
+    output param: return_date, the date of the data
+    output type: datetime date
     '''  
 
     if arg == None:
-        return_date = date.today().strftime('%m-%d-%Y') 
+        return_date = date.today()
     else:
-        return_date = arg
+        return_date = datetime.strptime(arg, DATE_FORMAT).date()
 
     return return_date 
     
@@ -71,21 +164,20 @@ def set_directory(directory, date, plat):
     Set the save directory of plot and text/csv files. Directories are broken up by day.
 
     input param: directory, the path to the directory of data.
-    input type: string
+    input type: pathlib Path
 
     input param: date, the date of data we want to plot
-    input type: string
+    input type: datetime date
 
     input param: plat, the platform where the data we want to plot are from
 
     return param: day_dir, directory for plots with name of the format dd-mm-yyy.
+    return type: pathlib Path
     '''
     
     print(directory, date, plat)
-    day_dir = directory + date + '/'
-    
-    if not os.path.exists(day_dir):
-        os.makedirs(day_dir)
+    day_dir = Path(directory) / date.strftime(DATE_FORMAT)
+    day_dir.mkdir(parents=True, exist_ok=True)
     
     #logging.info('Average Data Text Files Saved to {}'.format(avg_day_dir))
     #logging.info('Plots Saved to {}'.format(plot_day_dir))
@@ -102,66 +194,150 @@ def make_text(file_name, save_directory, frame):
     input type: string
 
     input param: save_directory, where the more easily readable text file will be saved
-    input type: string
+    input type: pathlib Path
 
     input param: frame, the pandas dataframe containing our data
     input type: pandas dataframe
     '''
     text_file = file_name[:-4] + '.txt'
 
-    header = ''
+    text_path = save_directory / text_file
+    out_cols = list(frame.columns) + ['Total Current', 'Total Power']
+
+    # the date is formatted differently than the rest of the values
+    header = ''.join('{:<25}'.format(val) if val == 'Time' else '{:<20}'.format(val) for val in out_cols)
 
     try:
-        # since the file is so small (~80kB at most) just rewrite the whole file each time a new line 
-        # appears in the csv
-        # this isn't the best way to do this, could probably append new lines to the end of the file
-        with open(save_directory+text_file, 'w') as txt:
-            for val in list(frame.columns):
+        # a csv with only a header still gets a text file with just the header
+        if frame.empty:
+            with open(text_path, 'w') as txt:
+                txt.write(header + '\n')
+            return
+
+        # format the whole numeric block at once rather than value by value, any text columns are
+        # written out as they are
+        numeric_cols = [col for col in frame.columns if col != 'Time' and pd.api.types.is_numeric_dtype(frame[col])]
+        values = frame[numeric_cols].to_numpy(dtype=float)
+
+        # calculate total power and current draw for every row at once
+        current_mask = np.array(['Current' in col for col in numeric_cols], dtype=bool)
+        power_mask = np.array(['Power' in col for col in numeric_cols], dtype=bool)
+        values = np.column_stack((values, values[:, current_mask].sum(axis=1), values[:, power_mask].sum(axis=1)))
+        cells = np.char.ljust(np.char.mod('%.2f', values), 20)
+
+        cell_ind = {val: ind for ind, val in enumerate(numeric_cols + ['Total Current', 'Total Power'])}
+
+        lines = np.full(len(frame), '', dtype=str)
+        for val in out_cols:
+            if val == 'Time':
+                lines = np.char.add(lines, np.char.ljust(frame[val].to_numpy().astype(str), 25))
+            elif val in cell_ind:
+                lines = np.char.add(lines, cells[:, cell_ind[val]])
+            else:
+                lines = np.char.add(lines, np.char.ljust(frame[val].to_numpy().astype(str), 25))
+        lines = lines.tolist()
+
+        # the csv only ever has lines appended to it, so only write the rows after the last one already in
+        # the text file. That's only safe if the file is exactly what a full write up to that row would be,
+        # checked with the last row and the file size, otherwise (e.g. a write was cut off) rewrite it all.
+        mode = 'w'
+        written = get_rows_written(text_path, header, lines)
+        if written is not None:
+            mode = 'a'
+            lines = lines[written:]
+            if not lines:
+                return
+
+        text = ''.join(line + '\n' for line in lines)
+        with open(text_path, mode) as txt:
+            if mode == 'w':
+                txt.write(header + '\n')
+            txt.write(text)
 
-                if val == 'Time':
-                    header += '{:<25}'.format(val)
-                else:
-                    header += '{:<20}'.format(val)
+    except Exception as e:
+        print(e)
+        logging.error('Error Encountered: {}'.format(e), exc_info=True)
+
+
+def get_rows_written(text_path, header, lines):
+    '''
+    Return how many of the rows make_text would write are already in the text file, so only the rest need 
+    to be appended. Only the header and the end of the file are read, the rest is checked with the file size.
+
+    input param: text_path, the text file made by make_text
+    input type: pathlib Path
+
+    input param: header, the header line make_text would write for the current data
+    input type: string
 
-            header += '{:<20}{:<20}'.format('Total Current', 'Total Power')
-            txt.write(header+'\n')
+    input param: lines, every row make_text would write for the current data, in order
+    input type: list
 
-            for index, row in frame.iterrows():
+    output param: written, the number of rows already in the file, or None if the file doesn't exist, has 
+    a different header (e.g. a sensor was added), was cut off part way through a row, or otherwise doesn't 
+    match a full write, meaning the file should be rewritten.
+    output type: integer
+    '''
 
-                str_vals = ''
-                current_tot = 0
-                power_tot = 0
+    try:
+        with open(text_path, 'rb') as txt:
+            if txt.readline().decode().rstrip('\n') != header:
+                return None
 
-                for val, ind in zip(row.values, row.index):
+            # a row is a few hundred bytes at most, so the last one is always in the final block
+            size = txt.seek(0, os.SEEK_END)
+            txt.seek(max(0, size - 4096))
+            tail = txt.read()
 
-                    #Calculate total power and current draw
-                    if 'Current' in ind:
-                        current_tot += val
-                    if 'Power' in ind:
-                        power_tot += val
+        # a write that was cut off leaves a partial row without a newline
+        if not tail.endswith(b'\n'):
+            return None
 
-                    # if the value is the date, the format is different
-                    if type(val) is str:
-                        str_vals += '{:<25}'.format(val)
-                    else:
-                        str_vals += '{:<20.2f}'.format(val)
+        last_line = tail.decode().splitlines()[-1]
+        if last_line == header:
+            written = 0
+        elif last_line in lines:
+            # the last copy, in case the csv has repeated rows
+            written = len(lines) - lines[::-1].index(last_line)
+        else:
+            return None
 
-                str_vals += '{:<20.2f}{:<20.2f}\n'.format(current_tot, power_tot)
-                txt.write(str_vals)
-            txt.close()
+        expected = len(header.encode()) + 1 + sum(len(line.encode()) + 1 for line in lines[:written])
+        if size != expected:
+            return None
 
-    except Exception as e:
-        print(e)
-        logging.error('Error Encountered: {}'.format(e), exc_info=True)
+        return written
 
+    except (OSError, UnicodeDecodeError, IndexError):
+        return None
 
-def get_plot_params(cols):
+
+def classify(col):
+    '''
+    Return the plot category of a column, or None if the column isn't plotted
+
+    input param: col, the column name
+    input type: string
+
+    output param: category, one of PLOT_CATEGORIES or None
+    output type: string
+    '''
+
+    match = CATEGORY_RE.search(col)
+
+    return match.group(1) if match else None
+
+
+def get_plot_params(cols, categories=None):
     '''
     Create a tuple using zip that has the data to be plotted and the plot number they go on. Also, return the number of subplots needed    
 
     input param: cols, a list of all of the keys of the pandas dataframe
     input type: list
 
+    input param: categories, the category of each column from classify, built here if not given
+    input type: dictionary
+
     output param: plot_params, tuple of lists that has the type of plotted data [PM, Current, etc] with the plot number.
     output type: tuple
     ouput param: plot_count, the number of subplots needed to display the data
@@ -169,66 +345,54 @@ def get_plot_params(cols):
     '''
     
     plot_count = 0
-    counted_list = []
-    plot_num = []    
-
-    try:    
-        for val in cols:
-            print(val)
-            if 'PM' in val:
-                if 'PM' not in counted_list:
-                    counted_list.append('PM')
-                    plot_count += 1
-                    plot_num.append(plot_count)
-            if 'Temp' or 'RH' in val:
-                if 'Temp' not in counted_list:
-                    counted_list.append('Temp')
-                    plot_count += 1
-                    plot_num.append(plot_count)
-                if 'RH' not in counted_list:
-                    counted_list.append('RH')
-                    plot_num.append(plot_count)
-            if 'Current' in val:
-                if 'Current' not in counted_list:
-                    counted_list.append('Current')
-                    plot_count += 1
-                    plot_num.append(plot_count)
-            if 'Voltage' in val:
-                if 'Voltage' not in counted_list:
-                    counted_list.append('Voltage')
-                    plot_count += 1
-                    plot_num.append(plot_count)
-            if 'Power' in val:
-                if 'Power' not in counted_list:
-                    counted_list.append('Power')
-                    plot_count += 1
-                    plot_num.append(plot_count)
-            if 'Pressure' in val:
-                if 'Pressure' not in counted_list:
-                    counted_list.append('Pressure')
-                    plot_count += 1
-                    plot_num.append(plot_count)
-            if 'Gas' or 'CO2' in val:
-                if 'Gas' not in counted_list:
-                    counted_list.append('Gas')
-                    plot_count += 1
-                    plot_num.append(plot_count)
-                if 'CO2' not in counted_list:
-                    counted_list.append('CO2')
-                    plot_num.append(plot_count)
-
-        #print(counted_list, plot_num, plot_count)
-        
-        plot_params = zip(counted_list, plot_num)
-        #print(list(plot_params))
+    plot_map = {}
+
+    # partner categories that are drawn on a twin of the same subplot
+    partners = dict(SHARED_AXES)
+    partners.update({host: shared for shared, host in SHARED_AXES.items()})
+
+    try:
+        if categories is None:
+            categories = {val: classify(val) for val in cols}
+
+        # columns without a category are dropped
+        for cat in dict.fromkeys(categories[val] for val in cols):
+            if cat is None:
+                continue
+            if partners.get(cat) in plot_map:
+                plot_map[cat] = plot_map[partners[cat]]
+            else:
+                plot_count += 1
+                plot_map[cat] = plot_count
 
     except Exception as e:
         print(e)
         logging.error('Error Encounted: {}'.format(e), exc_info=True)
 
+    plot_params = zip(plot_map.keys(), plot_map.values())
+
     return plot_count, plot_params  
 
 
+def configure_axis(ax, ylabel, ylim):
+    '''
+    Apply the y axis label and limits of a plot category to an axis
+
+    input param: ax, the axis to configure
+    input type: matplotlib axes
+
+    input param: ylabel, the y axis label
+    input type: string
+
+    input param: ylim, the (bottom, top) y axis limits, or None to leave them to matplotlib
+    input type: tuple
+    '''
+
+    ax.set_ylabel(ylabel)
+    if ylim is not None:
+        ax.set_ylim(*ylim)
+
+
 def plot_data(frame, save_directory, plat, file_name, date):
     '''
     Plot the data from file
@@ -237,7 +401,7 @@ def plot_data(frame, save_directory, plat, file_name, date):
     input type: pandas dataframe
 
     input param: save_directory, the directory where the plot will be saved
-    input type: string 
+    input type: pathlib Path
 
     input param: plat, platform we are plotting data for
     input type: string
@@ -245,239 +409,98 @@ def plot_data(frame, save_directory, plat, file_name, date):
     input param: file_name, the name of the csv file we're plotting from. Will share names but be different type
     input type: string
     
-    input param: date
-    input type: string
+    input param: date, the date of data we're plotting
+    input type: datetime date
     '''
     
-    number_of_plots, plot_parameters = get_plot_params(list(frame.columns))
-    plot_names, plot_nums = zip(*plot_parameters)
+    # the pi creates the day's csv before the first average is written, nothing to plot until then
+    if frame.empty:
+        print('No data to plot in {}'.format(file_name))
+        logging.info('No data to plot in {}'.format(file_name))
+        return
+
+    # classify the columns once, it's used for both the subplot layout and grouping the columns
+    categories = {val: classify(val) for val in frame.columns}
+    number_of_plots, plot_parameters = get_plot_params(list(frame.columns), categories)
+    plot_map = dict(plot_parameters)
 
     plot_file = file_name[:-4] + '.png'
     lg_size = 6
-    
-    #print(number_of_plots, list(plot_parameters))
-    print(plot_names, plot_nums)
   
-    fig, ax = plt.subplots(number_of_plots, sharex=True, figsize=(10, 15))
-
-    '''
-    #prints the key needed to access the data in the frame, and the data
-    for val in list(frame.columns):
-        print(val, frame[val])
-    '''
-
-    # these are used to make sure colors aren't duplicated in the temperature and RH plots
-    hot_colors = ['r', '#F97306', 'm', '#FFFF14']
-    cold_colors = ['b', 'g', 'c']
-    h_i = 0
-    c_i = 0
-
-    # used for correctly applying handles in temp and rh plots
-    temp_rh_handles = []    
-    gas_handles = []
+    global _FIG
+    if _FIG is None:
+        _FIG = plt.figure(figsize=(10, 15), constrained_layout=True)
+    else:
+        _FIG.clf()
+    fig = _FIG
+    ax = fig.subplots(number_of_plots, sharex=True, squeeze=False)[:, 0]
 
-    # make sure the frames are in ascending order according to Time
-    # this can be hard coded since we will alwasy have a Time frame and it will always be called Time
-    frame = frame.sort_values('Time', ascending=True)
     try:
-        for val in list(frame.columns):
-            print(val)
-            if 'PM' in val:
-                if 'ST' in val:
-                    next
-                else:
-                    pm_ind = plot_nums[plot_names.index('PM')]-1
-                    ax[pm_ind].plot(frame['Time'], frame[val], label=val)
-                    #ax[pm_ind].set_ylim(bottom=0)
-                    ax[pm_ind].set_ylabel('PM Conc (ug/m3)')
-                    ax[pm_ind].grid(True)
-                    ax[pm_ind].legend(loc='upper left', prop={'size':lg_size})
-                    ax[pm_ind].xaxis.set_major_locator(plt.LinearLocator(12))
-
-            if 'Current' in val:
-                curr_ind = plot_nums[plot_names.index('Current')]-1
-                ax[curr_ind].plot(frame['Time'], frame[val], label=val)
-                ax[curr_ind].set_ylim(0,500)
-                ax[curr_ind].set_ylabel('Current (mA)')
-                ax[curr_ind].grid(True)
-                ax[curr_ind].legend(loc='upper left', prop={'size':lg_size})
-                ax[curr_ind].xaxis.set_major_locator(plt.LinearLocator(12))
-
-            if 'Power' in val:
-                pow_ind = plot_nums[plot_names.index('Power')]-1
-                ax[pow_ind].plot(frame['Time'], frame[val], label=val)
-                ax[pow_ind].set_ylim(0, 15)
-                ax[pow_ind].set_ylabel('Power (W)')
-                ax[pow_ind].grid(True)
-                ax[pow_ind].legend(loc='upper left', prop={'size':lg_size})
-                ax[pow_ind].xaxis.set_major_locator(plt.LinearLocator(12))
-
-            if 'Voltage' in val:
-                volt_ind = plot_nums[plot_names.index('Voltage')]-1
-                ax[volt_ind].plot(frame['Time'], frame[val], label=val)
-                ax[volt_ind].set_ylim(0, 16)
-                ax[volt_ind].set_ylabel('Voltage (V)')
-                ax[volt_ind].grid(True)
-                ax[volt_ind].legend(loc='upper left', prop={'size':lg_size})
-                ax[volt_ind].xaxis.set_major_locator(plt.LinearLocator(12))
-            if 'Temp' or 'RH' in val:
-                #these if/else statements allow us to us both temp and rh, or just one of them.
-                if 'Temp' and 'RH' in plot_names:
-                    temp_ind = plot_nums[plot_names.index('Temp')]-1
-                    rh_ind = plot_nums[plot_names.index('RH')]-1
-
-                    if temp_ind > rh_ind:
-                        if 'Temp' in val:
-                            lg, = ax[temp_ind].plot(frame['Time'], frame[val], label=val, c=hot_colors[h_i])
-                            temp_rh_handles.append(lg)
-                            h_i += 1
-                            ax[temp_ind].grid(True)
-                            ax[temp_ind].set_ylim(-20, 80)
-                            ax[temp_ind].set_ylabel("Temp (C))")
-                            ax[temp_ind].set_xlim(frame['Time'].iloc[0], frame['Time'].iloc[-1])
-                            ax[temp_ind].legend(handles=temp_rh_handles, loc='upper right', prop={'size':lg_size})
-
-                        if 'RH' in val:
-                            rh_ax = ax[temp_ind].twinx()
-                            rh_ind = plot_nums[plot_names.index('RH')]
-                            lg, = rh_ax.plot(frame['Time'], frame[val], label=val, c=cold_colors[c_i])
-                            temp_rh_handles.append(lg)
-                            c_i += 1
-                            #rh_ax.grid(True)
-                            rh_ax.set_ylim(0, 100)
-                            rh_ax.set_ylabel("RH (%)")
-                            ax[temp_ind].legend(handles=temp_rh_handles, loc='upper right', prop={'size':lg_size})
-                            
-                    else:
-                        if 'RH' in val:
-                            lg, = ax[rh_ind].plot(frame['Time'], frame[val], label=val, c=cold_colors[c_i])
-                            temp_rh_handles.append(lg)
-                            c_i += 1
-                            ax[rh_ind].grid(True)
-                            ax[rh_ind].set_ylim(0,100)
-                            ax[rh_ind].set_ylabel("RH (%))")
-                            ax[rh_ind].set_xlim(frame['Time'].iloc[0], frame['Time'].iloc[-1])
-                            ax[rh_ind].legend(handles=temp_rh_handles, loc='upper right', prop={'size':lg_size})
-
-                        if 'Temp' in val:
-                            temp_ax = ax[rh_ind].twinx()
-                            lg, = temp_ax.plot(frame['Time'], frame[val], label=val, c=hot_colors[h_i])
-                            temp_rh_handles.append(lg)
-                            h_i += 1
-                            #temp_ax.grid(True)
-                            temp_ax.set_ylim(-20, 80)
-                            temp_ax.set_ylabel("Temp (C)")
-                            ax[rh_ind].legend(handles=temp_rh_handles, loc='upper right', prop={'size':lg_size})
-
-                elif 'Temp' in list(frame.columns) and 'RH' not in plot_names:
-                    if 'Temp' in val:
-                        temp_ind = plot_nums[plot_names.index('Temp')]-1
-                        ax[temp_ind].plot(frame['Time'], frame[val], label=val, c=hot_colors[h_i])
-                        h_i += 1
-                        ax[temp_ind].grid(True)
-                        ax[temp_ind].set_ylim(-20, 80)
-                        ax[temp_ind].set_ylabel("Temp (C))")
-                        ax[temp_ind].set_xlim(frame['Time'].iloc[0], frame['Time'].iloc[-1])
-                        ax[temp_ind].legend(handles=temp_rh_handles, loc='upper right', prop={'size':lg_size})
-                elif 'RH' in list(frame.columns) and 'Temp' not in plot_names:
-                    if 'RH' in val:
-                        rh_ind = plot_nums[plot_names.index('RH')]-1
-                        ax[rh_ind].plot(frame['Time'], frame[val], label=val, c=cold_colors[c_i])
-                        c_i += 1
-                        ax[rh_ind].grid(True)
-                        ax[rh_ind].set_ylim(0,100)
-                        ax[rh_ind].set_ylabel("RH (%))")
-                        ax[rh_ind].set_xlim(frame['Time'].iloc[0], frame['Time'].iloc[-1])
-                        ax[rh_ind].legend(handles=temp_rh_handles, loc='upper right', prop={'size':lg_size})
-
-
-            if 'Pressure' in val:
-                press_ind = plot_nums[plot_names.index('Pressure')]-1
-                ax[press_ind].plot(frame['Time'], frame[val], label=val)
-                ax[press_ind].set_ylim(0, 1000)
-                ax[press_ind].set_ylabel('Pressure (hPa)')
-                ax[press_ind].grid(True)
-                ax[press_ind].legend(loc='upper left', prop={'size':lg_size})
-                ax[press_ind].xaxis.set_major_locator(plt.LinearLocator(12))
-
-            if 'Gas' or 'CO2' in val:
-                #check to see that both exist in the list
-                #if they do, evaluate where the are in the list to know which axes to create first
-                if 'Gas' and 'CO2' in plot_names:
-                    gas_ind = plot_nums[plot_names.index('Gas')]-1
-                    co2_ind = plot_nums[plot_names.index('CO2')]-1
-                    
-                    if gas_ind > co2_ind:
-                        if 'Gas' in val:
-                            #gas_ind = plot_nums[plot_names.index('Gas')]
-                            lg, = ax[gas_ind].plot(frame['Time'], frame[val], label=val, c='r')
-                            gas_handles.append(lg)
-                            ax[gas_ind].grid(True)
-                            ax[gas_ind].set_ylim(bottom=0)
-                            ax[gas_ind].set_ylabel("BME Gas (ohms)")
-                            ax[gas_ind].set_xlim(frame['Time'].iloc[0], frame['Time'].iloc[-1])
-                            ax[gas_ind].legend(handles=gas_handles, loc='upper right', prop={'size':lg_size})
-
-                        if 'CO2' in val:
-                            co2_ax = ax[gas_ind].twinx()
-                            lg, = co2_ax.plot(frame['Time'], frame[val], label=val, c='b')
-                            gas_handles.append(lg)
-                            #co2_ax.grid(True)                     
-                            co2_ax.set_ylim(bottom=0)                   
-                            co2_ax.set_ylabel("CO2 CONC (PPM)")
-                            ax[gas_ind].legend(handles=gas_handles, loc='upper right', prop={'size':lg_size})
-                    else:
-                        if 'CO2' in val:
-                            lg, = ax[co2_ind].plot(frame['Time'], frame[val], label=val, c='b')
-                            gas_handles.append(lg)
-                            ax[co2_ind].grid(True)
-                            ax[co2_ind].set_ylim(bottom=0)
-                            ax[co2_ind].set_ylabel("CO2 CONC (PPM)")
-                            ax[co2_ind].set_xlim(frame['Time'].iloc[0], frame['Time'].iloc[-1])
-                            ax[co2_ind].legend(handles=gas_handles, loc='upper right', prop={'size':lg_size})
-                        if 'Gas' in val:
-                            gas_ax = ax[co2_ind].twinx()
-                            lg, = gas_ax.plot(frame['Time'], frame[val], label=val, c='r')
-                            gas_handles.append(lg)
-                            #gas_ax.grid(True)
-                            gas_ax.set_ylim(bottom=0)
-                            gas_ax.set_ylabel("BME Gas (ohms)")
-                            ax[co2_ind].legend(handles=gas_handles, loc='upper right', prop={'size':lg_size})
-
-
-                elif ('Gas' in plot_names and 'CO2' not in plot_names):
-                    if 'Gas' in val:
-                        gas_ind = plot_nums[plot_names.index('Gas')]-1
-                        ax[gas_ind].plot(frame['Time'], frame[val], label=val, c='r')     
-                        ax[gas_ind].grid(True)
-                        ax[gas_ind].set_ylim(bottom=0)
-                        ax[gas_ind].set_ylabel("BME Gas (ohms)")
-                        ax[gas_ind].set_xlim(frame['Time'].iloc[0], frame['Time'].iloc[-1])
-                        ax[gas_ind].legend(handles=gas_handles, loc='upper right', prop={'size':lg_size})
-
-                elif ('CO2' in plot_names and 'Gas' not in plot_names):
-                    print("eff")
-                    if 'CO2' in val:
-                        co2_ind = plot_nums[plot_names.index('CO2')]-1
-                        ax[co2_ind].plot(frame['Time'], frame[val], label=val, c='b')
-                        ax[co2_ind].grid(True)
-                        ax[co2_ind].set_ylim(bottom=0)
-                        ax[co2_ind].set_ylabel("CO2 CONC (PPM)")
-                        ax[co2_ind].set_xlim(frame['Time'].iloc[0], frame['Time'].iloc[-1])
-                        ax[co2_ind].legend(handles=gas_handles, loc='upper right', prop={'size':lg_size})
-
-        
-        ax[0].set_xlim(frame['Time'].iloc[0], frame['Time'].iloc[-1])
-        ax[0].xaxis.set_major_locator(plt.LinearLocator(12))  
-        plt.xticks(rotation=35)
-        plot_name = save_directory + plot_file
+        # the frame is already sorted by Time in reader with the parsed times as the index, times with a 
+        # UTC offset are plotted in UTC and any that couldn't be parsed are at the end
+        t = frame.index.tz_localize(None).to_numpy()
+        t_valid = t[~np.isnat(t)]
+        t0, t1 = t_valid[0], t_valid[-1]
+
+        # group the columns by the subplot category they belong to, PM ST columns aren't plotted
+        buckets = {cat: [] for cat in plot_map}
+        for val, cat in categories.items():
+            if cat in buckets and not (cat == 'PM' and 'ST' in val):
+                buckets[cat].append(val)
+
+        # convert the data to numpy once so matplotlib doesn't go back through pandas for every plot
+        data_cols = [val for cols in buckets.values() for val in cols]
+        data = frame[data_cols].to_numpy()
+        data_ind = {val: ind for ind, val in enumerate(data_cols)}
+
+        # lines drawn on each subplot and where their legend goes, the legends are built once at the end
+        handles = defaultdict(list)
+        legend_loc = {}
+
+        for cat, cols in buckets.items():
+            if not cols:
+                continue
+
+            plot_ind = plot_map[cat]-1
+
+            # the second category drawn on a shared subplot gets its own y axis
+            if plot_ind in handles:
+                cat_ax = ax[plot_ind].twinx()
+            else:
+                cat_ax = ax[plot_ind]
+
+            # make sure colors aren't duplicated between the two halves of a shared subplot
+            if cat in AXIS_COLORS:
+                cat_ax.set_prop_cycle(color=AXIS_COLORS[cat])
+
+            # draw every column of the category in one call, then label the lines it returns
+            lines = cat_ax.plot(t, data[:, [data_ind[val] for val in cols]])
+            for line, val in zip(lines, cols):
+                line.set_label(val)
+            handles[plot_ind].extend(lines)
+
+            ylabel, ylim = AXIS_CONFIG[cat]
+            configure_axis(cat_ax, ylabel, ylim)
+
+            # subplots with a twin axis keep their legend out of the way on the right
+            if cat in SHARED_AXES or cat in SHARED_AXES.values():
+                legend_loc[plot_ind] = 'upper right'
+
+        for plot_ind, plot_handles in handles.items():
+            ax[plot_ind].legend(handles=plot_handles, loc=legend_loc.get(plot_ind, 'upper left'), prop={'size':lg_size})
+
+        # the x axis is shared, so the limits and ticks only need to be set once after everything is drawn
+        for plot_ax in ax:
+            plot_ax.grid(True)
+        ax[0].set_xlim(t0, t1)
+        ax[0].xaxis.set_major_locator(mdates.AutoDateLocator(minticks=6, maxticks=12))
+        ax[0].xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+        plot_name = save_directory / plot_file
         print(plot_name)
-        fig.suptitle(plat + "Data From " + date)
-        plt.gcf().autofmt_xdate()
+        fig.suptitle(plat + "Data From " + date.strftime(DATE_FORMAT))
+        fig.autofmt_xdate(rotation=35)
         #plt.set_loglevel('ERROR')
-        plt.tight_layout()
-        plt.savefig(plot_name, dpi=300)
-        plt.close()
+        fig.savefig(plot_name, dpi=DPI)
         
     except Exception as e:
         print(e)
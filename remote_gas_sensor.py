@@ -1,32 +1,85 @@
 #!/usr/bin/env python3
 
 import os
+import time
 import argparse
 import logging
 import gas_sensor_plot as pa
 
-parser = argparse.ArgumentParser()
+from pathlib import Path
 
-parser.add_argument('-p', '--platform', type=str, help='Platform name of the unit to run the diagnostic code on e.g. GBUAPCDPI1')
-parser.add_argument('-d', '--date', type=str, help='Date that you would like to generate plots for e.g. 08-05-2021', default=None)
+# the raspberry pi writes a new 10 minute average every 10 minutes, in seconds
+UPDATE_INTERVAL = 600
 
-args = parser.parse_args()
-src_directory = os.getcwd() + '/data/' + args.platform + '/'
 
-date = pa.get_date(args.date)
-file_name = pa.get_file(date, args.platform)
-file_path = src_directory + file_name
-file_directory = pa.set_directory(src_directory, date, args.platform)
+def configure_logging(log_file):
+    '''
+    Log to the day's log file, force so a long running process moves on to the next day's log
 
-# create a log file to assist in debuggin
-log_file = file_directory + 'log.txt'
-logging.basicConfig(level=logging.INFO, filename=log_file, filemode='a', format='%(asctime)s - %(message)s', datefmt='%m/%d/%Y %H:%M:%S')
+    input param: log_file, the log file for the day being processed
+    input type: pathlib Path
+    '''
 
-# set a log level for the plotting to filter through generic information from the matplotlib logger
-mlogger = logging.getLogger('matplotlib')
-mlogger.setLevel(logging.WARNING)
+    logging.basicConfig(level=logging.INFO, filename=log_file, filemode='a', format='%(asctime)s - %(message)s', datefmt='%m/%d/%Y %H:%M:%S', force=True)
 
-#logging.info('Remote PurpleAir Log for {} on Date: {}'.format(args.platform, args.date))
-pa_frame = pa.reader(file_path)
-pa.make_text(file_name, file_directory, pa_frame)
-pa.plot_data(pa_frame, file_directory, args.platform, file_name, date)
+    # set a log level for the plotting to filter through generic information from the matplotlib logger
+    mlogger = logging.getLogger('matplotlib')
+    mlogger.setLevel(logging.WARNING)
+
+
+def process(platform, arg_date):
+    '''
+    Make the text file and plot for one platform from the latest CSV of 10 minute averages.
+
+    input param: platform, platform name of the unit e.g. GBUAPCDPI1
+    input type: string
+
+    input param: arg_date, the date passed to the script, or None for the current day
+    input type: string
+    '''
+
+    src_directory = Path(os.getcwd()) / 'data' / platform
+
+    date = pa.get_date(arg_date)
+    file_name = pa.get_file(date, platform)
+    file_path = src_directory / file_name
+    file_directory = pa.set_directory(src_directory, date, platform)
+
+    # create a log file to assist in debuggin
+    log_file = file_directory / 'log.txt'
+    configure_logging(log_file)
+
+    # the pi hasn't written the day's csv yet, e.g. just after midnight
+    if not file_path.exists():
+        print('No data file {} yet'.format(file_path))
+        logging.info('No data file {} yet, skipping'.format(file_path))
+        return
+
+    #logging.info('Remote PurpleAir Log for {} on Date: {}'.format(args.platform, args.date))
+    pa_frame = pa.reader(file_path)
+    pa.make_text(file_name, file_directory, pa_frame)
+    pa.plot_data(pa_frame, file_directory, platform, file_name, date)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('-p', '--platform', type=str, help='Platform name of the unit to run the diagnostic code on e.g. GBUAPCDPI1')
+    parser.add_argument('-d', '--date', type=str, help='Date that you would like to generate plots for e.g. 08-05-2021', default=None)
+    parser.add_argument('-l', '--loop', action='store_true', help='Keep running and update the files every 10 minutes instead of running once from the crontab')
+
+    args = parser.parse_args()
+
+    # a long running process reuses the plotting figure between updates instead of building a new one
+    while True:
+        try:
+            process(args.platform, args.date)
+        except Exception as e:
+            # one bad update shouldn't stop a long running process, try again at the next update
+            if not args.loop:
+                raise
+            print(e)
+            logging.error('Error Encountered: {}'.format(e), exc_info=True)
+
+        if not args.loop:
+            break
+        time.sleep(UPDATE_INTERVAL - time.time() % UPDATE_INTERVAL)
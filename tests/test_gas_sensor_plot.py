@@ -0,0 +1,99 @@
+import pandas as pd
+
+import gas_sensor_plot as pa
+
+
+def test_get_plot_params_counts_only_present_categories():
+    # 'Temp' or 'RH' in val used to always be true, reserving Temp and Gas subplots for every frame
+    plot_count, plot_params = pa.get_plot_params(['PM1', 'Current_5V'])
+
+    assert plot_count == 2
+    assert dict(plot_params) == {'PM': 1, 'Current': 2}
+
+
+def test_get_plot_params_shares_temp_rh_axis():
+    plot_count, plot_params = pa.get_plot_params(['BME_RH', 'PM1', 'BME_Temp'])
+
+    assert plot_count == 2
+    assert dict(plot_params) == {'RH': 1, 'PM': 2, 'Temp': 1}
+
+
+def test_classify():
+    assert pa.classify('PM2.5') == 'PM'
+    assert pa.classify('BME Gas') == 'Gas'
+    assert pa.classify('Time') is None
+
+
+def make_frame(rows, status=False):
+    frame = pd.DataFrame({
+        'Time': ['08/05/2021 {:02d}:{:02d}:00'.format(i // 6, i % 6 * 10) for i in range(rows)],
+        'PM1': [i + 0.25 for i in range(rows)],
+        'Current 5V': [100.0 + i for i in range(rows)],
+        'Power 5V': [0.5 * i for i in range(rows)],
+    })
+    if status:
+        frame.insert(0, 'Status', 'ok')
+
+    return frame
+
+
+def full_write(tmp_path, frame):
+    full_dir = tmp_path / 'full'
+    full_dir.mkdir()
+    pa.make_text('PI108052021.csv', full_dir, frame)
+
+    return (full_dir / 'PI108052021.txt').read_text()
+
+
+def test_make_text_appends_new_rows(tmp_path):
+    frame = make_frame(12)
+    pa.make_text('PI108052021.csv', tmp_path, frame.iloc[:5])
+    pa.make_text('PI108052021.csv', tmp_path, frame)
+    pa.make_text('PI108052021.csv', tmp_path, frame)
+
+    assert (tmp_path / 'PI108052021.txt').read_text() == full_write(tmp_path, frame)
+
+
+def test_make_text_repairs_cut_off_row(tmp_path):
+    frame = make_frame(12)
+    pa.make_text('PI108052021.csv', tmp_path, frame.iloc[:5])
+    text_path = tmp_path / 'PI108052021.txt'
+    text_path.write_text(text_path.read_text()[:-30])
+
+    pa.make_text('PI108052021.csv', tmp_path, frame)
+
+    assert text_path.read_text() == full_write(tmp_path, frame)
+
+
+def test_make_text_keeps_rows_with_repeated_time(tmp_path):
+    frame = make_frame(6)
+    frame.loc[5, 'Time'] = frame.loc[4, 'Time']
+    pa.make_text('PI108052021.csv', tmp_path, frame.iloc[:5])
+    pa.make_text('PI108052021.csv', tmp_path, frame)
+
+    assert (tmp_path / 'PI108052021.txt').read_text() == full_write(tmp_path, frame)
+
+
+def test_make_text_appends_with_text_column_before_time(tmp_path):
+    frame = make_frame(12, status=True)
+    text_path = tmp_path / 'PI108052021.txt'
+    pa.make_text('PI108052021.csv', tmp_path, frame.iloc[:5])
+    pa.make_text('PI108052021.csv', tmp_path, frame)
+    mtime = text_path.stat().st_mtime_ns
+    pa.make_text('PI108052021.csv', tmp_path, frame)
+
+    assert text_path.stat().st_mtime_ns == mtime
+    assert text_path.read_text() == full_write(tmp_path, frame)
+
+
+def test_reader_logs_column_left_out_of_totals(tmp_path, caplog):
+    frame = make_frame(3)
+    frame['Current 5V'] = frame['Current 5V'].astype(str)
+    frame.loc[1, 'Current 5V'] = 'nan mA'
+    frame.to_csv(tmp_path / 'PI108052021.csv', index=False)
+
+    df = pa.reader(tmp_path / 'PI108052021.csv')
+
+    assert df['PM1'].dtype == 'float64'
+    assert "['Current 5V']" in caplog.text
+    assert 'left out of the Current total' in caplog.text